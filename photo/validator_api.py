@@ -14,6 +14,9 @@ Behaviour:
     * resizes to 240x288 and compresses
     * saves to photos/approved or photos/rejected
     * if approved, uploads to Supabase
+- /validate-batch:
+    * same as /validate for several images (one distinct DNI per image, required)
+    * images are processed concurrently
 - /fix-photo:
     * runs the SAME background + passport-crop + compression pipeline
     * does NOT save or upload
@@ -21,16 +24,25 @@ Behaviour:
     * if background is not white, returns same error text as /validate
 """
 
-import base64
+import asyncio
+import binascii
+import functools
+import hashlib
 import io
 import os
 import re
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple, Iterable, cast
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, TypeVar
 
-import requests
+import httpx
+import numpy as np
 from dotenv import load_dotenv
-from fastapi import FastAPI, File, Form, UploadFile
+from fastapi import BackgroundTasks, FastAPI, File, Form, UploadFile
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from PIL import Image, ImageOps
 
@@ -41,29 +53,91 @@ TARGET_W, TARGET_H = 240, 288  # final dimensions
 
 MAX_BYTES = int(os.getenv("UMA_MAX_BYTES", 50 * 1024))        # final JPEG
 MAX_ORIGINAL_BYTES = int(os.getenv("UMA_MAX_ORIG_BYTES", MAX_BYTES))
+MAX_UPLOAD_BYTES = int(os.getenv("UMA_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))  # hard cap, never decoded
+MAX_IMAGE_PIXELS = int(os.getenv("UMA_MAX_IMAGE_PIXELS", 40_000_000))  # checked from the header
+MAX_IMAGE_SIDE = int(os.getenv("UMA_MAX_IMAGE_SIDE", 8000))              # idem, per side
+
+# Pillow's own decompression-bomb guard, as a second line of defence
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
 
 PHOTOS_DIR = os.getenv("UMA_PHOTOS_DIR", "photos")
 
+# Threads for decode/crop/resize/encode. Pillow and NumPy release the GIL in
+# those loops, so one thread per core runs them in parallel.
+PIPELINE_WORKERS = int(os.getenv("UMA_PIPELINE_WORKERS", os.cpu_count() or 1))
+
+# Recent pipeline results keyed by a hash of the upload (0 disables).
+# Students often resubmit the very same file after a rejection or retry.
+RESULT_CACHE_SIZE = int(os.getenv("UMA_RESULT_CACHE_SIZE", 128))
+
+MAX_BATCH_IMAGES = int(os.getenv("UMA_MAX_BATCH_IMAGES", 50))  # /validate-batch
+
 # background check (brightness 0-255 on grayscale)
 BORDER_PIXELS = 12           # border thickness to inspect
 WHITE_THRESHOLD = 210        # pixel >= this is considered "white"
 BACKGROUND_MIN_WHITE = 0.58  # 60% of border pixels must be white
 
+# ITU-R 601-2 luma in 16.16 fixed point: the same integer weights Pillow
+# uses for convert("L"), so thresholds match the grayscale values exactly.
+_LUMA_R, _LUMA_G, _LUMA_B = 19595, 38470, 7471
+_WHITE_LUMA_MIN = (WHITE_THRESHOLD << 16) - 0x8000  # "L" >= WHITE_THRESHOLD
+
+# JPEG quality search
+JPEG_Q_MIN, JPEG_Q_MAX = 35, 95
+JPEG_Q_START = 75            # first probe until we have seen some photos
+JPEG_Q_EMA_ALPHA = 0.2       # weight of the newest result in the running seed
+JPEG_CLOSE_ENOUGH = 0.9      # stop once size >= 90% of the limit
+JPEG_MAX_PROBES = 6          # worst case, same as the plain binary search
+JPEG_BUF_BYTES = 64 * 1024   # initial size of the per-thread encode buffer
+
+RESIZE_REDUCING_GAP = 3.0    # see Image.resize(reducing_gap=...)
+# JPEGs are decoded at 1/2, 1/4 or 1/8 scale as long as both sides stay
+# >= this (2x the final height, whatever the EXIF orientation turns out to be).
+JPEG_DRAFT_MIN_SIDE = 2 * TARGET_H
+
 os.makedirs(os.path.join(PHOTOS_DIR, "approved"), exist_ok=True)
 os.makedirs(os.path.join(PHOTOS_DIR, "rejected"), exist_ok=True)
 
-# Pillow resampling constant
-try: 
-    from PIL.Image import Resampling
-    
-    RESAMPLE_LANCZOS = Resampling.LANCZOS
+# Pillow resampling constants (Image.Resampling on Pillow >= 9.1)
+_RESAMPLING = getattr(Image, "Resampling", Image)
+RESAMPLE_LANCZOS = _RESAMPLING.LANCZOS
+
+# Filter for the final 240x288 resize (UMA_RESAMPLE = LANCZOS, BICUBIC,
+# BILINEAR, ...). After reducing_gap and JPEG quantisation BICUBIC looks the
+# same as LANCZOS at a fraction of the kernel work.
+RESAMPLE_FINAL = getattr(
+    _RESAMPLING, os.getenv("UMA_RESAMPLE", "BICUBIC").upper(), RESAMPLE_LANCZOS
+)
+
+# JPEG codec: official Pillow wheels link libjpeg-turbo (SIMD DCT/Huffman).
+try:
+    from PIL import features as _pil_features
+
+    JPEG_TURBO = bool(_pil_features.check_feature("libjpeg_turbo"))
 except Exception:  # pragma: no cover
-    RESAMPLE_LANCZOS = getattr(Image, "LANCZOS", getattr(Image, "BILINEAR", 2))
+    JPEG_TURBO = False
 
 # Supabase config
 SUPABASE_URL = os.getenv("SUPABASE_URL", "").rstrip("/")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
 SUPABASE_BUCKET = os.getenv("SUPABASE_BUCKET", "student-photos")
+# Upload approved photos after the response is sent (1) or before it (0)
+SUPABASE_BACKGROUND_UPLOAD = os.getenv("UMA_SUPABASE_BACKGROUND", "1") not in ("0", "false", "no")
+# Background uploads: attempts before giving up, first retry delay (doubles)
+SUPABASE_UPLOAD_ATTEMPTS = max(1, int(os.getenv("UMA_SUPABASE_UPLOAD_ATTEMPTS", 4)))
+SUPABASE_RETRY_DELAY = float(os.getenv("UMA_SUPABASE_RETRY_DELAY", 1.0))
+
+# One pooled async client for all uploads: keeps the TCP/TLS connection to
+# Supabase alive instead of handshaking on every approved photo, and does
+# not tie up a thread while waiting on the network.
+SUPABASE_CLIENT = httpx.AsyncClient(
+    headers={
+        "apikey": SUPABASE_SERVICE_ROLE_KEY,
+        "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
+    },
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=32),
+)
 
 def _log(*a: Any) -> None:
     print(*a, flush=True)
@@ -73,8 +147,36 @@ def _kb(num_bytes: int) -> float:
     return num_bytes / 1024.0
 
 
+def jpeg_data_url(jpg: bytes) -> str:
+    # Build in bytes and decode once: one str allocation instead of two.
+    return (b"data:image/jpeg;base64," + binascii.b2a_base64(jpg, newline=False)).decode("ascii")
+
+
+_T = TypeVar("_T")
+
+# Dedicated pool for CPU-bound work, sized to the cores instead of sharing
+# Starlette's 40-thread I/O pool (which would oversubscribe the CPU).
+_pipeline_pool = ThreadPoolExecutor(max_workers=PIPELINE_WORKERS, thread_name_prefix="uma-pipeline")
+
+
+async def run_cpu(func: Callable[..., _T], *args: Any, **kwargs: Any) -> _T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_pipeline_pool, functools.partial(func, *args, **kwargs))
+
+
+if not JPEG_TURBO:
+    _log("[jpeg] Pillow is not using libjpeg-turbo; JPEG encode/decode will be slower")
+
+
 # ---------------- Supabase helper ----------------
-def upload_to_supabase(jpg_bytes: bytes, path_in_bucket: str) -> Dict[str, Any]:
+def supabase_public_url(path_in_bucket: str) -> str:
+    return (
+        f"{SUPABASE_URL}/storage/v1/object/public/"
+        f"{SUPABASE_BUCKET}/{path_in_bucket.lstrip('/')}"
+    )
+
+
+async def upload_to_supabase(jpg_bytes: bytes, path_in_bucket: str) -> Dict[str, Any]:
     info: Dict[str, Any] = {"ok": False}
 
     if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
@@ -87,13 +189,11 @@ def upload_to_supabase(jpg_bytes: bytes, path_in_bucket: str) -> Dict[str, Any]:
         url = f"{SUPABASE_URL}/storage/v1/object/{object_path}"
 
         headers = {
-            "apikey": SUPABASE_SERVICE_ROLE_KEY,
-            "Authorization": f"Bearer {SUPABASE_SERVICE_ROLE_KEY}",
             "Content-Type": "image/jpeg",
             "x-upsert": "true",
         }
 
-        resp = requests.post(url, headers=headers, data=jpg_bytes, timeout=30)
+        resp = await SUPABASE_CLIENT.post(url, headers=headers, content=jpg_bytes)
 
         if resp.status_code not in (200, 201):
             info["error"] = f"upload_failed_{resp.status_code}"
@@ -101,10 +201,7 @@ def upload_to_supabase(jpg_bytes: bytes, path_in_bucket: str) -> Dict[str, Any]:
             _log("[supabase] upload failed:", info["error"], info.get("details", ""))
             return info
 
-        public_url = (
-            f"{SUPABASE_URL}/storage/v1/object/public/"
-            f"{SUPABASE_BUCKET}/{path_in_bucket.lstrip('/')}"
-        )
+        public_url = supabase_public_url(path_in_bucket)
 
         info.update({"ok": True, "public_url": public_url, "status": resp.status_code})
         _log("[supabase] uploaded:", public_url)
@@ -115,18 +212,121 @@ def upload_to_supabase(jpg_bytes: bytes, path_in_bucket: str) -> Dict[str, Any]:
         return info
 
 
+async def upload_to_supabase_background(jpg_bytes: bytes, path_in_bucket: str, dni: str) -> None:
+    """
+    Background-task upload. The response already carried the public URL,
+    so retry with backoff instead of failing on the first error, and log
+    loudly (with the DNI) if the object never gets there.
+    """
+    delay = SUPABASE_RETRY_DELAY
+    info: Dict[str, Any] = {}
+    for attempt in range(1, SUPABASE_UPLOAD_ATTEMPTS + 1):
+        info = await upload_to_supabase(jpg_bytes, path_in_bucket)
+        if info.get("ok"):
+            return
+        if attempt < SUPABASE_UPLOAD_ATTEMPTS:
+            await asyncio.sleep(delay)
+            delay *= 2
+    _log(
+        "[supabase] UPLOAD LOST after",
+        SUPABASE_UPLOAD_ATTEMPTS,
+        "attempts:",
+        "dni=",
+        dni,
+        "path=",
+        path_in_bucket,
+        "error=",
+        info.get("error"),
+    )
+
+
 # ---------------- Helpers ----------------
+_SANITIZE_RE = re.compile(r"[^\w\-]", flags=re.ASCII)
+
+
 def sanitize_name(s: Optional[str]) -> str:
-    return re.sub(r"[^\w\-]", "", (s or "").strip(), flags=re.ASCII)
+    s = (s or "").strip()
+    # DNIs are plain ASCII digits: nothing to remove, skip the regex.
+    if s.isascii() and s.isalnum():
+        return s
+    return _SANITIZE_RE.sub("", s)
+
+
+async def read_upload(upload: UploadFile) -> bytes:
+    """
+    Read the upload body once. At most MAX_UPLOAD_BYTES + 1 bytes are read,
+    so callers can tell an oversized upload apart without buffering all of it.
+    """
+    return await upload.read(MAX_UPLOAD_BYTES + 1)
+
+
+def write_file(path: str, data: bytes) -> None:
+    # One-shot write of a small file: raw fd, no BufferedWriter.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+
+def upload_too_large(raw_bytes: bytes) -> Optional[Dict[str, Any]]:
+    if len(raw_bytes) <= MAX_UPLOAD_BYTES:
+        return None
+    limit_mb = MAX_UPLOAD_BYTES / (1024 * 1024)
+    return {
+        "ok": False,
+        "issues": [f"El archivo es demasiado grande; debe pesar como máximo {limit_mb:.0f} MB."],
+        "bytes": 0,
+    }
+
+
+class ImageTooLarge(ValueError):
+    """Image dimensions exceed MAX_IMAGE_PIXELS / MAX_IMAGE_SIDE."""
+
+    def __init__(self, width: Optional[int] = None, height: Optional[int] = None) -> None:
+        super().__init__(f"image too large: {width}x{height}")
+        self.width = width
+        self.height = height
+
+
+def image_too_large(exc: ImageTooLarge) -> Dict[str, Any]:
+    limit_mp = MAX_IMAGE_PIXELS / 1_000_000
+    dims = f" ({exc.width}x{exc.height} px)" if exc.width and exc.height else ""
+    return {
+        "ok": False,
+        "issues": [
+            f"La imagen es demasiado grande{dims}; "
+            f"debe tener como máximo {MAX_IMAGE_SIDE} px por lado y {limit_mp:.0f} MP."
+        ],
+        "bytes": 0,
+    }
 
 
-def load_pil(upload: UploadFile, raw_bytes: Optional[bytes] = None) -> Tuple[Image.Image, bytes]:
-    if raw_bytes is None:
-        raw_bytes = upload.file.read()
-    pil = Image.open(io.BytesIO(raw_bytes))
-    if hasattr(ImageOps, "exif_transpose"):
+def load_pil(raw_bytes: bytes) -> Image.Image:
+    # BytesIO over bytes shares the buffer (no copy until written to).
+    try:
+        pil = Image.open(io.BytesIO(raw_bytes))
+    except Image.DecompressionBombError:
+        # Pillow's own guard (> 2x MAX_IMAGE_PIXELS) fires inside open().
+        raise ImageTooLarge()
+    # open() only parses the header; refuse huge images before decoding pixels.
+    w, h = pil.size
+    if w * h > MAX_IMAGE_PIXELS or max(w, h) > MAX_IMAGE_SIDE:
+        raise ImageTooLarge(w, h)
+    if pil.format == "JPEG":
+        # Let libjpeg downscale during decode (scaled IDCT): a 12 MP phone
+        # photo comes out ~16x smaller and everything after gets cheaper.
+        pil.draft("RGB", (JPEG_DRAFT_MIN_SIDE, JPEG_DRAFT_MIN_SIDE))
+    # exif_transpose() and convert() both return a full copy even when there
+    # is nothing to do, so only call them when needed.
+    if hasattr(ImageOps, "exif_transpose") and pil.getexif().get(0x0112, 1) != 1:
         pil = ImageOps.exif_transpose(pil)
-    return pil.convert("RGB"), raw_bytes
+    if pil.mode != "RGB":
+        return pil.convert("RGB")
+    pil.load()  # decode here so broken files are reported as invalid images
+    return pil
 
 
 def border_white_ratio(pil_img: Image.Image) -> float:
@@ -137,31 +337,28 @@ def border_white_ratio(pil_img: Image.Image) -> float:
     w, h = pil_img.size
     b = max(2, min(BORDER_PIXELS, w // 4, h // 4))
 
-    gray = pil_img.convert("L")
-
-    def frac_white(region: Image.Image) -> float:
-        # getdata() returns an ImagingCore which *is* iterable at runtime,
-        # but we cast it so static analysis is happy.
-        data_iter = cast(Iterable[int], region.getdata())
-        data_list = list(data_iter)
-        total = len(data_list)
-        if total == 0:
-            return 0.0
-        white = sum(1 for v in data_list if v >= WHITE_THRESHOLD)
-        return white / total
+    # Mean of the four strips' white fractions (corners sit in two strips),
+    # which is what BACKGROUND_MIN_WHITE is tuned against.
+    boxes = (
+        (0, 0, w, b),
+        (0, h - b, w, h),
+        (0, 0, b, h),
+        (w - b, 0, w, h),
+    )
 
-    top = gray.crop((0, 0, w, b))
-    bottom = gray.crop((0, h - b, w, h))
-    left = gray.crop((0, 0, b, h))
-    right = gray.crop((w - b, 0, w, h))
+    ratios: List[float] = []
+    for box in boxes:
+        # Luma + threshold straight from the RGB strip, no grayscale image.
+        rgb = np.asarray(pil_img.crop(box), dtype=np.uint32)
+        luma = rgb[..., 0] * _LUMA_R + rgb[..., 1] * _LUMA_G + rgb[..., 2] * _LUMA_B
+        ratios.append(np.count_nonzero(luma >= _WHITE_LUMA_MIN) / luma.size if luma.size else 0.0)
 
-    vals = [frac_white(r) for r in (top, bottom, left, right)]
-    return sum(vals) / len(vals)
+    return sum(ratios) / len(ratios)
 
 
-def passport_crop(pil_img: Image.Image) -> Image.Image:
+def passport_crop_box(pil_img: Image.Image) -> Tuple[int, int, int, int]:
     """
-    Crop image to a passport-style portrait:
+    Box (left, top, right, bottom) for a passport-style portrait crop:
 
     - Keep aspect ratio TARGET_W : TARGET_H (240x288).
     - Zoom in, but not too aggressively, so we keep space above the head.
@@ -173,6 +370,7 @@ def passport_crop(pil_img: Image.Image) -> Image.Image:
     # Use about 90% of the height if the image is tall enough.
     crop_factor = 0.9 if h > TARGET_H * 1.2 else 1.0
     new_h = max(int(h * crop_factor), TARGET_H)
+    new_h = min(new_h, h)  # box must stay inside the image for resize(box=...)
     new_w = int(new_h * target_ratio)
 
     # If that crop would be wider than the original, fall back to width-limited.
@@ -189,33 +387,92 @@ def passport_crop(pil_img: Image.Image) -> Image.Image:
     top = max_top // 2 if max_top > 0 else 0
     bottom = top + new_h
 
-    return pil_img.crop((left, top, right, bottom))
+    return left, top, right, bottom
+
+
+# Running average of the qualities recently returned; seeds the next search.
+_last_good_q: float = float(JPEG_Q_START)
+
+# One reusable encode buffer per worker thread.
+_encode_local = threading.local()
+
+
+def _encode_buffer() -> io.BytesIO:
+    buf = getattr(_encode_local, "buf", None)
+    if buf is None:
+        buf = io.BytesIO(bytearray(JPEG_BUF_BYTES))
+        _encode_local.buf = buf
+    return buf
 
 
 def jpg_under_size(pil_img: Image.Image, limit: int = MAX_BYTES) -> bytes:
-    lo, hi = 35, 95
-    best: Optional[bytes] = None
-    while lo <= hi:
-        q = (lo + hi) // 2
-        buf = io.BytesIO()
+    """
+    Encode as JPEG at the highest quality we can find that stays <= limit.
+
+    Output is always TARGET_W x TARGET_H, so size vs. quality is very
+    similar from photo to photo. Instead of a plain binary search over
+    JPEG_Q_MIN..JPEG_Q_MAX, start at the running average of recent
+    results and jump to the quality predicted from the last size, falling
+    back to bisection between the best fitting and lowest failing quality
+    whenever the prediction lands outside that bracket.
+
+    Every probe uses the final optimize+progressive settings, so the size
+    that decides whether a quality fits is the size we return.
+    """
+    # Overwrite from the start instead of truncate(0), which would give the
+    # allocation back; only the first `size` bytes are ever read.
+    buf = _encode_buffer()
+    size = 0
+
+    def encode(q: int) -> int:
+        nonlocal size
+        buf.seek(0)
         pil_img.save(buf, format="JPEG", quality=q, optimize=True, progressive=True)
         size = buf.tell()
-        if size <= limit:
-            best = buf.getvalue()
-            lo = q + 1
+        return size
+
+    def payload() -> bytes:
+        with buf.getbuffer() as view:
+            return view[:size].tobytes()
+
+    def predict(q: int, size: int) -> int:
+        # JPEG size grows roughly with the square of quality in this range.
+        return int(q * (limit / size) ** 0.5)
+
+    global _last_good_q
+
+    # lo fits (or is below the range), hi does not (or is above it)
+    lo, hi = JPEG_Q_MIN - 1, JPEG_Q_MAX + 1
+    best: Optional[bytes] = None
+    q = max(JPEG_Q_MIN, min(JPEG_Q_MAX, round(_last_good_q)))
+
+    for _ in range(JPEG_MAX_PROBES):
+        if encode(q) <= limit:
+            lo, best = q, payload()
+            if size >= limit * JPEG_CLOSE_ENOUGH:
+                break
         else:
-            hi = q - 1
-    if best is not None:
-        return best
-    buf = io.BytesIO()
-    pil_img.save(buf, format="JPEG", quality=35, optimize=True, progressive=True)
-    return buf.getvalue()
+            hi = q
+        if hi - lo <= 1:
+            break
+        guess = predict(q, size)
+        q = guess if lo < guess < hi else (lo + hi) // 2
+
+    if best is None:
+        # Nothing fits: smallest quality we allow, limit or not.
+        lo = JPEG_Q_MIN
+        encode(JPEG_Q_MIN)
+        best = payload()
+
+    _last_good_q += JPEG_Q_EMA_ALPHA * (lo - _last_good_q)
+    return best
 
 
 def run_pipeline(
     pil_img: Image.Image,
     *,
     require_white_bg: bool = True,
+    _resample: int = RESAMPLE_FINAL,  # bound once as a fast local
 ) -> Tuple[bytes, Dict[str, Any]]:
     """
     Core pipeline:
@@ -236,11 +493,30 @@ def run_pipeline(
             "sin objetos ni colores de fondo. Repita la foto con un fondo completamente blanco."
         )
 
-    # 2) crop to passport style
-    cropped = passport_crop(pil_img)
-
-    # 3) resize to final size
-    out_img = cropped.resize((TARGET_W, TARGET_H), resample=RESAMPLE_LANCZOS)
+    # 2) crop to passport style + 3) resize to final size
+    w, h = pil_img.size
+    if (w, h) == (TARGET_W, TARGET_H):
+        # Already final size (e.g. a photo produced by /fix-photo).
+        out_img = pil_img
+    else:
+        box: Optional[Tuple[int, int, int, int]]
+        if h <= TARGET_H * 1.2 and abs(w / h - TARGET_W / TARGET_H) < 0.02:
+            # Small and already at the target ratio: the passport crop would
+            # not zoom and would keep (almost) the whole frame, so skip it.
+            box = None
+        else:
+            box = passport_crop_box(pil_img)
+
+        # box: crop and resample in one pass, no intermediate cropped image.
+        # reducing_gap: box-reduce by an integer factor first (area averaging),
+        # then the final filter over the remaining <= 3x; visually the same as a
+        # single-filter downscale but much cheaper on large phone photos.
+        out_img = pil_img.resize(
+            (TARGET_W, TARGET_H),
+            resample=_resample,
+            box=box,
+            reducing_gap=RESIZE_REDUCING_GAP,
+        )
 
     # 4) compress under limit
     jpg = jpg_under_size(out_img, MAX_BYTES)
@@ -256,8 +532,56 @@ def run_pipeline(
     return jpg, info
 
 
+_result_cache: "OrderedDict[Tuple[bytes, bool], Tuple[bytes, Dict[str, Any]]]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def process_upload(
+    raw_bytes: bytes,
+    *,
+    require_white_bg: bool = True,
+) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+    """
+    Decode + run_pipeline in one call, so endpoints can hand the whole
+    CPU-bound part to the pipeline pool at once. Identical uploads are
+    served from a small LRU cache.
+    Returns None if the bytes are not a readable image; raises
+    ImageTooLarge if its dimensions are over the limits.
+    """
+    key = (hashlib.blake2b(raw_bytes, digest_size=16).digest(), require_white_bg)
+    with _result_cache_lock:
+        cached = _result_cache.get(key)
+        if cached is not None:
+            _result_cache.move_to_end(key)
+    if cached is not None:
+        jpg, info = cached
+        return jpg, dict(info, issues=list(info["issues"]))
+
+    try:
+        pil_in = load_pil(raw_bytes)
+    except ImageTooLarge:
+        raise
+    except Exception:
+        return None
+    jpg, info = run_pipeline(pil_in, require_white_bg=require_white_bg)
+
+    if RESULT_CACHE_SIZE > 0:
+        with _result_cache_lock:
+            _result_cache[key] = (jpg, dict(info, issues=list(info["issues"])))
+            while len(_result_cache) > RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+    return jpg, info
+
+
 # ---------------- FastAPI app ----------------
-app = FastAPI(title="UMA Photo Validator (no OpenCV)")
+@asynccontextmanager
+async def lifespan(_app: FastAPI) -> AsyncIterator[None]:
+    yield
+    # Release the pooled Supabase connections on shutdown.
+    await SUPABASE_CLIENT.aclose()
+
+
+app = FastAPI(title="UMA Photo Validator (no OpenCV)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -277,6 +601,7 @@ def root() -> Dict[str, Any]:
         "endpoints": {
             "health": "/health",
             "validate": "/validate",
+            "validate_batch": "/validate-batch",
             "fix_photo": "/fix-photo",
         },
     }
@@ -291,50 +616,87 @@ def health() -> Dict[str, Any]:
         "target": [TARGET_W, TARGET_H],
         "max_bytes": MAX_BYTES,
         "max_original_bytes": MAX_ORIGINAL_BYTES,
+        "max_upload_bytes": MAX_UPLOAD_BYTES,
+        "pipeline_workers": PIPELINE_WORKERS,
+        "jpeg_turbo": JPEG_TURBO,
         "supabase": {
             "url": SUPABASE_URL,
             "bucket": SUPABASE_BUCKET,
             "configured": bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY),
+            "background_upload": SUPABASE_BACKGROUND_UPLOAD,
+            "upload_attempts": SUPABASE_UPLOAD_ATTEMPTS,
         },
     }
 
 
 # ---------------- /validate ----------------
-@app.post("/validate")
-def validate(
-    dni: Optional[str] = Form(None, description="Student DNI used as output filename"),
-    image: UploadFile = File(...),
+async def validate_upload(
+    image: UploadFile,
+    dni: Optional[str],
+    background: BackgroundTasks,
 ) -> Dict[str, Any]:
+    """
+    Whole /validate flow for one upload: checks, pipeline, local save and
+    Supabase upload. Shared by /validate and /validate-batch.
+    """
     dni = sanitize_name(dni) or "unknown_user"
 
     try:
+        raw_bytes = await read_upload(image)
+        too_large = upload_too_large(raw_bytes)
+        if too_large is not None:
+            return too_large
+
+        original_size = len(raw_bytes)
+
+        # Original too heavy: reject before decoding, the pipeline result
+        # would be discarded anyway.
+        if original_size > MAX_ORIGINAL_BYTES:
+            limit_kb = MAX_ORIGINAL_BYTES // 1024
+            issues = [
+                "Foto inválida: El archivo original pesa "
+                f"{_kb(original_size):.1f} KB; debe ser ≤ {limit_kb} KB. "
+                'Usa el botón "Arreglar con IA" o selecciona otra foto.'
+            ]
+            _log(
+                "[validator]",
+                "dni=",
+                dni,
+                "ok=",
+                False,
+                "issues=",
+                issues,
+                "orig_bytes=",
+                original_size,
+            )
+            return {
+                "ok": False,
+                "issues": issues,
+                "width": TARGET_W,
+                "height": TARGET_H,
+                "bytes": 0,
+                "category": "rejected",
+                "filename": "",
+                "relative_path": "",
+                "data_url": "",
+                "supabase_url": None,
+                "supabase": {},
+            }
+
+        # Decode + main pipeline (background check + passport crop) on the pipeline pool
         try:
-            pil_in, raw_bytes = load_pil(image)
-        except Exception:
+            result = await run_cpu(process_upload, raw_bytes, require_white_bg=True)
+        except ImageTooLarge as e:
+            return image_too_large(e)
+        if result is None:
             return {
                 "ok": False,
                 "issues": ["Archivo no es una imagen válida."],
                 "bytes": 0,
             }
-
-        original_size = len(raw_bytes)
-
-        # Run main pipeline (includes background check + passport crop)
-        jpg, info = run_pipeline(pil_in, require_white_bg=True)
+        jpg, info = result
         issues: List[str] = list(info.get("issues", []))
 
-        # Extra check on original size for friendly message
-        if original_size > MAX_ORIGINAL_BYTES:
-            limit_kb = MAX_ORIGINAL_BYTES // 1024
-            issues.insert(
-                0,
-                (
-                    "Foto inválida: El archivo original pesa "
-                    f"{_kb(original_size):.1f} KB; debe ser ≤ {limit_kb} KB. "
-                    'Usa el botón "Arreglar con IA" o selecciona otra foto.'
-                ),
-            )
-
         ok = len(issues) == 0 and len(jpg) <= MAX_BYTES
 
         if not ok and not issues:
@@ -344,22 +706,30 @@ def validate(
         bucket = "approved" if ok else "rejected"
         ts = int(time.time())
         fname = f"{dni}.jpg" if ok else f"{dni}_{ts}.jpg"
-        save_dir = os.path.join(PHOTOS_DIR, bucket)
-        os.makedirs(save_dir, exist_ok=True)
-        save_path = os.path.join(save_dir, fname)
-        with open(save_path, "wb") as f:
-            f.write(jpg)
+        # photos/approved and photos/rejected are created at import time.
+        save_path = os.path.join(PHOTOS_DIR, bucket, fname)
+        # Blocking disk write: keep it off the event loop (I/O threadpool,
+        # not the CPU-sized pipeline pool).
+        await run_in_threadpool(write_file, save_path, jpg)
 
         # Base64 data URL
-        data_url = "data:image/jpeg;base64," + base64.b64encode(jpg).decode("ascii")
+        data_url = jpeg_data_url(jpg)
 
         # Supabase upload for approved photos
         supabase_info: Dict[str, Any] = {}
         supabase_url: Optional[str] = None
         if ok:
             object_path = f"approved/{fname}"
-            supabase_info = upload_to_supabase(jpg, object_path)
-            supabase_url = supabase_info.get("public_url")
+            supabase_configured = bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY)
+            if supabase_configured and SUPABASE_BACKGROUND_UPLOAD:
+                # Public URL is deterministic, so answer now and upload after
+                # the response has been sent.
+                background.add_task(upload_to_supabase_background, jpg, object_path, dni)
+                supabase_url = supabase_public_url(object_path)
+                supabase_info = {"pending": True, "public_url": supabase_url}
+            else:
+                supabase_info = await upload_to_supabase(jpg, object_path)
+                supabase_url = supabase_info.get("public_url")
 
         _log(
             "[validator]",
@@ -402,9 +772,61 @@ def validate(
         }
 
 
+@app.post("/validate")
+async def validate(
+    background: BackgroundTasks,
+    dni: Optional[str] = Form(None, description="Student DNI used as output filename"),
+    image: UploadFile = File(...),
+) -> Dict[str, Any]:
+    return await validate_upload(image, dni, background)
+
+
+# ---------------- /validate-batch ----------------
+@app.post("/validate-batch")
+async def validate_batch(
+    background: BackgroundTasks,
+    dni: List[str] = Form(..., description="One DNI per image, same order"),
+    images: List[UploadFile] = File(...),
+) -> Dict[str, Any]:
+    """
+    Bulk enrollment: validate several photos in one request.
+
+    Each image goes through exactly the same flow as /validate; the
+    pipelines run concurrently on the pipeline pool, so a batch uses all
+    cores instead of one request per photo.
+
+    Every image needs its own DNI (same order, no blanks, no repeats):
+    approved photos are stored as <dni>.jpg, so a missing or repeated DNI
+    would overwrite another student's photo.
+    """
+    dnis = [sanitize_name(d) for d in dni]
+    issues: List[str] = []
+    if len(images) > MAX_BATCH_IMAGES:
+        issues.append(f"Máximo {MAX_BATCH_IMAGES} fotos por envío.")
+    elif len(dnis) != len(images):
+        issues.append(f"Se recibieron {len(images)} fotos y {len(dnis)} DNI; debe haber un DNI por foto.")
+    elif not all(dnis):
+        issues.append("Cada foto debe tener un DNI válido.")
+    elif len(set(dnis)) != len(dnis):
+        issues.append("Hay DNI repetidos en el envío.")
+    if issues:
+        return {"ok": False, "issues": issues, "count": 0, "results": []}
+
+    results = await asyncio.gather(
+        *(validate_upload(img, d, background) for img, d in zip(images, dnis))
+    )
+
+    return {
+        "ok": all(r.get("ok") for r in results),
+        "count": len(results),
+        # Echo the sanitized DNI: it is the name the photo was saved under.
+        "results": [dict(r, dni=d) for r, d in zip(results, dnis)],
+    }
+
+
 # ---------------- /fix-photo ----------------
 @app.post("/fix-photo")
-def fix_photo(
+async def fix_photo(
     image: UploadFile = File(...),
 ) -> Dict[str, Any]:
     """
@@ -415,21 +837,27 @@ def fix_photo(
     - Does NOT save or upload anything.
     """
     try:
+        raw_bytes = await read_upload(image)
+        too_large = upload_too_large(raw_bytes)
+        if too_large is not None:
+            return too_large
+
         try:
-            pil_in, raw_bytes = load_pil(image)
-        except Exception:
+            result = await run_cpu(process_upload, raw_bytes, require_white_bg=True)
+        except ImageTooLarge as e:
+            return image_too_large(e)
+        if result is None:
             return {
                 "ok": False,
                 "issues": ["Archivo no es una imagen válida."],
                 "bytes": 0,
             }
-
-        jpg, info = run_pipeline(pil_in, require_white_bg=True)
+        jpg, info = result
         issues: List[str] = list(info.get("issues", []))
 
         ok = len(issues) == 0 and len(jpg) <= MAX_BYTES
 
-        data_url = "data:image/jpeg;base64," + base64.b64encode(jpg).decode("ascii")
+        data_url = jpeg_data_url(jpg)
 
         _log(
             "[fix-photo]",
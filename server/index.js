@@ -192,7 +192,17 @@ async function loadSubmissions() {
   return loadSubmissionsFromFile();
 }
 
-async function upsertSubmissionInDb(submission) {
+// Photo-only columns, for callers that do not know the student's profile
+// (e.g. /validate-batch): existing identity columns are left untouched.
+const PHOTO_ONLY_UPDATE = `
+      category = excluded.category,
+      issues = excluded.issues,
+      supabase_url = excluded.supabase_url,
+      photo_filename = excluded.photo_filename,
+      updated_at = now()
+`;
+
+async function upsertSubmissionInDb(submission, { photoOnly = false } = {}) {
   if (!DB_ENABLED || !pool) return;
 
   const issues = Array.isArray(submission.issues)
@@ -221,7 +231,10 @@ async function upsertSubmissionInDb(submission) {
       $1, $2, $3, $4, $5, $6, $7,
       $8, $9, $10, $11, now()
     )
-    on conflict (dni) do update set
+    on conflict (dni) do update set${
+      photoOnly
+        ? PHOTO_ONLY_UPDATE
+        : `
       codigo = excluded.codigo,
       name = excluded.name,
       email = excluded.email,
@@ -233,6 +246,8 @@ async function upsertSubmissionInDb(submission) {
       photo_filename = excluded.photo_filename,
       sunedu_status = excluded.sunedu_status,
       updated_at = now()
+`
+    }
   `;
 
   const params = [
@@ -822,6 +837,87 @@ app.post('/api/admin/teacher-schedule', async (req, res) => {
 });
 
 // ---------- PHOTO VALIDATOR PROXY + LOG ----------
+// Fields a photo-only update may overwrite on an existing submission.
+const PHOTO_FIELDS = [
+  'category',
+  'ok',
+  'photoUrl',
+  'filename',
+  'relative_path',
+  'issues',
+  'data_url',
+  'supabase_url',
+  'updatedAt',
+];
+
+// Record one validator result in the submissions log (DB or JSON file).
+// photoOnly: only update the photo fields of an existing student, keeping
+// its name/email/facultad/carrera/code (used when no profile is known).
+async function recordSubmission(
+  { dni, code, name, email, facultad, esp },
+  data,
+  { photoOnly = false } = {}
+) {
+  try {
+    const ok = !!data.ok;
+    const category = data.category || (ok ? 'approved' : 'rejected');
+    const filename = data.filename || '';
+    const relPath = (data.relative_path || '').toString();
+
+    let photoUrl = '';
+    if (filename) {
+      photoUrl = `/photos/${category}/${filename}`;
+    } else if (relPath) {
+      const normalized = relPath.replace(/\\/g, '/');
+      if (normalized.startsWith('photos/')) {
+        const tail = normalized.slice('photos/'.length);
+        photoUrl = `/photos/${tail}`;
+      }
+    }
+
+    const now = new Date().toISOString();
+
+    const submission = {
+      dni,
+      code,
+      name,
+      email,
+      facultad,
+      carrera: esp,
+      esp,
+      category,
+      ok,
+      photoUrl,
+      filename,
+      relative_path: relPath,
+      issues: Array.isArray(data.issues) ? data.issues : [],
+      data_url: data.data_url || null,
+      supabase_url: data.supabase_url || null,
+      suneduStatus: 'Pendiente',
+      updatedAt: now,
+    };
+
+    if (DB_ENABLED) {
+      await upsertSubmissionInDb(submission, { photoOnly });
+    } else {
+      const list = await loadSubmissionsFromFile();
+      const idxExisting = list.findIndex((s) => s.dni === dni);
+      if (idxExisting >= 0) {
+        const update = photoOnly
+          ? Object.fromEntries(PHOTO_FIELDS.map((k) => [k, submission[k]]))
+          : submission;
+        list[idxExisting] = { ...list[idxExisting], ...update };
+      } else {
+        submission.createdAt = now;
+        list.push(submission);
+      }
+      await saveSubmissionsToFile(list);
+    }
+  } catch (err) {
+    console.error('[submissions] log error:', err);
+  }
+}
+
 app.post('/validate', upload.single('image'), async (req, res) => {
   try {
     const file = req.file;
@@ -911,65 +1007,76 @@ app.post('/validate', upload.single('image'), async (req, res) => {
     const data = response.data || {};
 
     // ----- log submission -----
-    try {
-      const ok = !!data.ok;
-      const category = data.category || (ok ? 'approved' : 'rejected');
-      const filename = data.filename || '';
-      const relPath = (data.relative_path || '').toString();
-
-      let photoUrl = '';
-      if (filename) {
-        photoUrl = `/photos/${category}/${filename}`;
-      } else if (relPath) {
-        const normalized = relPath.replace(/\\/g, '/');
-        if (normalized.startsWith('photos/')) {
-          const tail = normalized.slice('photos/'.length);
-          photoUrl = `/photos/${tail}`;
-        }
-      }
+    await recordSubmission({ dni, code, name, email, facultad, esp }, data);
 
-      const now = new Date().toISOString();
+    res.status(response.status || 200).json(data);
+  } catch (err) {
+    console.error('Validator proxy error:', err);
+    res.status(500).json({
+      ok: false,
+      issues: ['Validation service error: ' + err.message],
+    });
+  }
+});
 
-      const submission = {
-        dni,
-        code,
-        name,
-        email,
-        facultad,
-        carrera: esp,
-        esp,
-        category,
-        ok,
-        photoUrl,
-        filename,
-        relative_path: relPath,
-        issues: Array.isArray(data.issues) ? data.issues : [],
-        data_url: data.data_url || null,
-        supabase_url: data.supabase_url || null,
-        suneduStatus: 'Pendiente',
-        updatedAt: now,
-      };
+// ---------- BULK PHOTO VALIDATOR PROXY + LOG ----------
+// Fields: images[] and dni[] (one per image, same order); code[] optional.
+app.post('/validate-batch', upload.array('images'), async (req, res) => {
+  try {
+    const files = req.files || [];
+    const bodyFields = req.body || {};
+    const dnis = [].concat(bodyFields.dni || []);
+    const codes = [].concat(bodyFields.code || []);
 
-      if (DB_ENABLED) {
-        await upsertSubmissionInDb(submission);
-      } else {
-        const list = await loadSubmissionsFromFile();
-        const idxExisting = list.findIndex((s) => s.dni === dni);
-        if (idxExisting >= 0) {
-          list[idxExisting] = { ...list[idxExisting], ...submission };
-        } else {
-          submission.createdAt = now;
-          list.push(submission);
-        }
-        await saveSubmissionsToFile(list);
-      }
-    } catch (err) {
-      console.error('[submissions] log error:', err);
+    if (!files.length) {
+      return res.status(400).json({ ok: false, issues: ['No file provided'] });
+    }
+
+    // ----- call Python validator (it checks the DNI list) -----
+    const formData = new FormData();
+    files.forEach((file) => {
+      formData.append('images', file.buffer, {
+        filename: file.originalname,
+        contentType: file.mimetype || 'application/octet-stream',
+      });
+    });
+    dnis.forEach((dni) => formData.append('dni', dni));
+
+    const url = `${VALIDATOR_URL}/validate-batch`;
+    console.log('[validate-batch] calling validator at:', url, 'images:', files.length);
+
+    const response = await axios.post(url, formData, {
+      headers: formData.getHeaders(),
+      maxContentLength: Infinity,
+      maxBodyLength: Infinity,
+      validateStatus: () => true,
+    });
+
+    const data = response.data || {};
+
+    // ----- log submissions (one at a time: the JSON file is read-modify-write) -----
+    // No profile lookup here, so only the photo fields of known students are
+    // updated. The validator echoes the sanitized DNI its files are named by.
+    const results = Array.isArray(data.results) ? data.results : [];
+    for (let i = 0; i < results.length; i++) {
+      const result = results[i] || {};
+      await recordSubmission(
+        {
+          dni: result.dni || dnis[i],
+          code: codes[i] || '',
+          name: '',
+          email: '',
+          facultad: '',
+          esp: '',
+        },
+        result,
+        { photoOnly: true }
+      );
     }
 
     res.status(response.status || 200).json(data);
   } catch (err) {
-    console.error('Validator proxy error:', err);
+    console.error('Validator batch proxy error:', err);
     res.status(500).json({
       ok: false,
       issues: ['Validation service error: ' + err.message],